@@ -15,15 +15,15 @@ Behaviour summary (implemented as tools exposed to the LLM):
 The GameMasterAgent uses these tools and acts as the high-energy improv host.
 """
 
-import json
 import logging
 import os
 import asyncio
-import uuid
 import random
+import secrets
+import time
+from collections import deque
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List, Dict, Optional, Annotated
+from typing import Dict, Optional, Annotated
 
 from dotenv import load_dotenv
 from pydantic import Field
@@ -70,14 +70,36 @@ SCENARIOS = [
     "You are a detective interrogating a suspect who only answers in awkward metaphors."
 ]
 
+# Keyword cues -> highlight the host calls out in its reaction
+HIGHLIGHT_CUES = (
+    (("funny", "lol", "hahaha", "haha"), "great comedic timing"),
+    (("sad", "cry", "tears"), "good emotional depth"),
+    (("pause", "..."), "interesting use of silence"),
+)
+FALLBACK_HIGHLIGHTS = ("nice character choices", "bold commitment", "unexpected twist")
+REACTION_TONES = ("supportive", "neutral", "mildly_critical")
+
+# Keywords used by summarize_show to profile the player's style
+CHARACTER_WORDS = ("i am", "i'm", "as a", "character", "role")
+EMOTION_WORDS = ("sad", "angry", "happy", "love", "cry", "tears")
+
 # -------------------------
 # Per-session Improv State
 # -------------------------
+def _now_iso() -> str:
+    """UTC timestamp in ISO-8601 with microseconds and a trailing 'Z'."""
+    t = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int((t % 1) * 1e6):06d}Z"
+
+
+# Only the most recent events are kept; record_performance reads the tail.
+MAX_HISTORY = 64
+
 @dataclass
 class Userdata:
     player_name: Optional[str] = None
-    session_id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
-    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
+    session_id: str = field(default_factory=lambda: secrets.token_hex(4))
+    started_at: str = field(default_factory=_now_iso)
     improv_state: Dict = field(default_factory=lambda: {
         "current_round": 0,
         "max_rounds": 3,
@@ -85,14 +107,14 @@ class Userdata:
         "phase": "idle",  # "intro" | "awaiting_improv" | "reacting" | "done" | "idle"
         "used_indices": []
     })
-    history: List[Dict] = field(default_factory=list)
+    history: deque[dict] = field(default_factory=lambda: deque(maxlen=MAX_HISTORY))
 
 # -------------------------
 # Helpers
 # -------------------------
 
 def _pick_scenario(userdata: Userdata) -> str:
-    used = userdata.improv_state.get("used_indices", [])
+    used = set(userdata.improv_state.get("used_indices", []))
     candidates = [i for i in range(len(SCENARIOS)) if i not in used]
     if not candidates:
         # reset if we exhausted scenarios
@@ -103,21 +125,24 @@ def _pick_scenario(userdata: Userdata) -> str:
     return SCENARIOS[idx]
 
 
+def _snip(text: Optional[str], limit: int = 80) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
 def _host_reaction_text(performance: str) -> str:
     # Lightweight heuristic to vary reaction tone
-    tones = ["supportive", "neutral", "mildly_critical"]
-    tone = random.choice(tones)
+    tone = random.choice(REACTION_TONES)
     # Quick keyword detection to pick specific highlights (not exhaustive)
-    highlights = []
-    if any(w in performance.lower() for w in ("funny", "lol", "hahaha", "haha")):
-        highlights.append("great comedic timing")
-    if any(w in performance.lower() for w in ("sad", "cry", "tears")):
-        highlights.append("good emotional depth")
-    if any(w in performance.lower() for w in ("pause", "...")):
-        highlights.append("interesting use of silence")
+    performance_lc = performance.lower()
+    highlights = [
+        highlight
+        for keywords, highlight in HIGHLIGHT_CUES
+        if any(w in performance_lc for w in keywords)
+    ]
     if not highlights:
         # fallback picks
-        highlights.append(random.choice(["nice character choices", "bold commitment", "unexpected twist"]))
+        highlights.append(random.choice(FALLBACK_HIGHLIGHTS))
 
     chosen = random.choice(highlights)
     if tone == "supportive":
@@ -153,7 +178,7 @@ async def start_show(
     userdata.improv_state["current_round"] = 0
     userdata.improv_state["rounds"] = []
     userdata.improv_state["phase"] = "intro"
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "start_show", "name": userdata.player_name})
+    userdata.history.append({"time": _now_iso(), "action": "start_show", "name": userdata.player_name})
 
     intro = (
         f"Welcome to Improv Battle! I'm your host — let's get ready to play."
@@ -164,7 +189,7 @@ async def start_show(
     scenario = _pick_scenario(userdata)
     userdata.improv_state["current_round"] = 1
     userdata.improv_state["phase"] = "awaiting_improv"
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "present_scenario", "round": 1, "scenario": scenario})
+    userdata.history.append({"time": _now_iso(), "action": "present_scenario", "round": 1, "scenario": scenario})
 
     return intro + "\nRound 1: " + scenario + "\nStart improvising now!"
 
@@ -186,7 +211,7 @@ async def next_scenario(ctx: RunContext[Userdata]) -> str:
     scenario = _pick_scenario(userdata)
     userdata.improv_state["current_round"] = next_round
     userdata.improv_state["phase"] = "awaiting_improv"
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "present_scenario", "round": next_round, "scenario": scenario})
+    userdata.history.append({"time": _now_iso(), "action": "present_scenario", "round": next_round, "scenario": scenario})
     return f"Round {next_round}: {scenario}\nGo!"
 
 
@@ -198,7 +223,7 @@ async def record_performance(
     userdata = ctx.userdata
     if userdata.improv_state.get("phase") != "awaiting_improv":
         # still accept performance but warn
-        userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "record_performance_out_of_phase"})
+        userdata.history.append({"time": _now_iso(), "action": "record_performance_out_of_phase"})
 
     round_no = userdata.improv_state.get("current_round", 0)
     scenario = userdata.history[-1].get("scenario") if userdata.history and userdata.history[-1].get("action") == "present_scenario" else "(unknown)"
@@ -212,7 +237,7 @@ async def record_performance(
         "reaction": reaction,
     })
     userdata.improv_state["phase"] = "reacting"
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "record_performance", "round": round_no})
+    userdata.history.append({"time": _now_iso(), "action": "record_performance", "round": round_no})
 
     # If we've reached max rounds, change to done after reaction
     if round_no >= userdata.improv_state.get("max_rounds", 3):
@@ -234,17 +259,17 @@ async def summarize_show(ctx: RunContext[Userdata]) -> str:
         return "No rounds were played. Thanks for stopping by Improv Battle!"
 
     # Simple summary heuristics: count supportive vs critical words, highlight standout moments
-    summary_lines = [f"Thanks for playing, {userdata.player_name or 'Contestant'}! Here's a short recap:"]
+    header = f"Thanks for playing, {userdata.player_name or 'Contestant'}! Here's a short recap:"
     # highlight each round briefly
-    for r in rounds:
-        perf_snip = (r.get("performance") or "").strip()
-        if len(perf_snip) > 80:
-            perf_snip = perf_snip[:77] + "..."
-        summary_lines.append(f"Round {r.get('round')}: {r.get('scenario')} — You: '{perf_snip}' | Host: {r.get('reaction')}")
+    recap = "\n".join(
+        f"Round {r.get('round')}: {r.get('scenario')} — You: '{_snip(r.get('performance'))}' | Host: {r.get('reaction')}"
+        for r in rounds
+    )
 
     # aggregate a simple profile
-    mentions_character = sum(1 for r in rounds if any(w in (r.get('performance') or '').lower() for w in ('i am', "i'm", 'as a', 'character', 'role')))
-    mentions_emotion = sum(1 for r in rounds if any(w in (r.get('performance') or '').lower() for w in ('sad', 'angry', 'happy', 'love', 'cry', 'tears')))
+    performances_lc = [(r.get('performance') or '').lower() for r in rounds]
+    mentions_character = sum(1 for p in performances_lc if any(w in p for w in CHARACTER_WORDS))
+    mentions_emotion = sum(1 for p in performances_lc if any(w in p for w in EMOTION_WORDS))
 
     profile = "You seem to be a player who "
     if mentions_character > len(rounds) / 2:
@@ -256,11 +281,8 @@ async def summarize_show(ctx: RunContext[Userdata]) -> str:
 
     profile += ". Keep leaning into clear choices and stronger stakes."
 
-    summary_lines.append(profile)
-    summary_lines.append("Thanks for performing on Improv Battle — hope to see you again!")
-
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "summarize_show"})
-    return "\n".join(summary_lines)
+    userdata.history.append({"time": _now_iso(), "action": "summarize_show"})
+    return "\n".join((header, recap, profile, "Thanks for performing on Improv Battle — hope to see you again!"))
 
 
 @function_tool
@@ -269,30 +291,32 @@ async def stop_show(ctx: RunContext[Userdata], confirm: Annotated[bool, Field(de
     if not confirm:
         return "Are you sure you want to stop the show? Say 'stop show yes' to confirm."
     userdata.improv_state["phase"] = "done"
-    userdata.history.append({"time": datetime.utcnow().isoformat() + "Z", "action": "stop_show"})
+    userdata.history.append({"time": _now_iso(), "action": "stop_show"})
     return "Show stopped. Thanks for coming to Improv Battle!"
 
 
 # -------------------------
 # The Agent (Improv Host)
 # -------------------------
+_GM_INSTRUCTIONS = """
+You are the host of a TV improv show called 'Improv Battle'.
+Role: High-energy, witty, and clear about rules. Guide a single contestant through a series of short improv scenes.
+
+Behavioural rules:
+    - Introduce the show and explain the rules at the start.
+    - Present clear scenario prompts (who you are, what's happening, what's the tension).
+    - Prompt the player to improvise and listen for an explicit "End scene" or accept an utterance passed to record_performance.
+    - After each scene, react in a varied, realistic way (supportive, neutral, mildly critical). Store the reaction.
+    - Run the configured number of rounds, then summarize the player's style.
+    - Keep turns short and TTS-friendly.
+Use the provided tools: start_show, next_scenario, record_performance, summarize_show, stop_show.
+"""
+
+
 class GameMasterAgent(Agent):
     def __init__(self):
-        instructions = """
-        You are the host of a TV improv show called 'Improv Battle'.
-        Role: High-energy, witty, and clear about rules. Guide a single contestant through a series of short improv scenes.
-
-        Behavioural rules:
-            - Introduce the show and explain the rules at the start.
-            - Present clear scenario prompts (who you are, what's happening, what's the tension).
-            - Prompt the player to improvise and listen for an explicit "End scene" or accept an utterance passed to record_performance.
-            - After each scene, react in a varied, realistic way (supportive, neutral, mildly critical). Store the reaction.
-            - Run the configured number of rounds, then summarize the player's style.
-            - Keep turns short and TTS-friendly.
-        Use the provided tools: start_show, next_scenario, record_performance, summarize_show, stop_show.
-        """
         super().__init__(
-            instructions=instructions,
+            instructions=_GM_INSTRUCTIONS,
             tools=[start_show, next_scenario, record_performance, summarize_show, stop_show],
         )
 